@@ -7,15 +7,25 @@ the results in a web-based graph interface.
 """
 
 import os
-import json
+import atexit
+import bisect
+import itertools
 import logging
+import re
+import select
+import signal
+import socket
+import struct
 import subprocess
+import sys
 import threading
 import time
+from array import array
 from datetime import datetime, timedelta
 from pathlib import Path
 
-from flask import Flask, render_template, jsonify
+from flask import Flask, render_template, request
+import orjson
 import pytz
 
 # Configuration
@@ -25,42 +35,433 @@ DATA_DIR = os.getenv('DATA_DIR', './data')
 PING_INTERVAL = 60  # seconds
 PING_TARGET = '8.8.8.8'
 
+PING_TIMEOUT = 5  # seconds
+CLEANUP_INTERVAL = 24 * 60 * 60  # seconds
+
+# Pings are buffered in memory and written out once either limit is reached
+FLUSH_MAX_PENDING = 10
+FLUSH_INTERVAL = 600  # seconds
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+
+# Cleared once the kernel refuses unprivileged ICMP sockets (see
+# net.ipv4.ping_group_range) so later pings go straight to the ping command
+_ICMP_SOCKET_ALLOWED = True
+_ICMP_SEQUENCE = itertools.count(1)
+
+# Round-trip time in raw `ping` output, e.g. b"time=12.3 ms"
+_TIME_RE = re.compile(rb'time=([\d.]+)')
+
+# Resolved once; pytz.timezone() is a lookup plus tzinfo construction per call
+_TZ = pytz.timezone(TIMEZONE)
+
 app = Flask(__name__)
 app.logger.setLevel(logging.INFO)
 
 # Ensure data directory exists
 Path(DATA_DIR).mkdir(exist_ok=True)
 
+# Parsed legacy .json files keyed by filename -> (st_mtime_ns, document).
+_DATA_CACHE: dict[str, tuple[int, dict]] = {}
+_DATA_CACHE_LOCK = threading.Lock()
+
+# Incremental parse state of .jsonl files keyed by filename -> {'generation',
+# 'ino', 'offset', 'lines', 'ts', 'stats', 'pending'}. Readers only decode lines
+# appended since the last call; entries are kept as their raw encoded lines
+# rather than decoded dicts, with their epoch-millisecond timestamps in the
+# parallel 'ts' array. 'pending' holds lines saved but not yet flushed to the
+# file; they are already included in 'lines', 'ts' and 'stats'.
+_TAIL: dict[str, dict] = {}
+_TAIL_LOCK = threading.Lock()
+_LAST_FLUSH = time.monotonic()
+
+# Source of each parse state's 'generation'. Seeded from the clock so states
+# built by a restarted process don't reuse the numbers of the previous one.
+_TAIL_GENERATION = itertools.count(time.time_ns())
+
+# (filename, total, successful, sum_rt) of today's stats, replaced as a whole by
+# the writer so /api/stats can read a consistent snapshot without taking
+# _TAIL_LOCK (a single reference assignment is atomic in CPython)
+_AGG = (None, 0, 0, 0.0)
+
+# (filename, fd) of the data file last flushed to, opened with O_APPEND so each
+# os.write lands at the end of the file. Rotated when the day changes.
+_APPEND_FD = (None, None)
+
+# (date, filename) for the current day, recomputed only on date rollover
+_TODAY_FILENAME = (None, None)
+
+_BACKGROUND_STARTED = False
+
 
 def get_today_filename():
     """Get filename for today's data based on configured timezone."""
-    tz = pytz.timezone(TIMEZONE)
-    today = datetime.now(tz).strftime('%Y-%m-%d')
-    return os.path.join(DATA_DIR, f'ping_data_{today}.json')
+    global _TODAY_FILENAME
+    
+    today = datetime.now(_TZ).date()
+    cached_date, filename = _TODAY_FILENAME
+    if cached_date != today:
+        filename = os.path.join(DATA_DIR, f'ping_data_{today:%Y-%m-%d}.jsonl')
+        _TODAY_FILENAME = (today, filename)
+    return filename
+
+
+def _empty_stats():
+    """Running aggregate stored alongside the entries of a data file."""
+    return {'total': 0, 'successful': 0, 'sum_rt': 0.0}
+
+
+def _add_to_stats(stats, entry):
+    """Return stats updated with a single entry, leaving the original intact."""
+    stats = dict(stats)
+    stats['total'] += 1
+    if entry['success']:
+        stats['successful'] += 1
+        stats['sum_rt'] += entry['response_time']
+    return stats
+
+
+def _as_document(data):
+    """
+    Normalize parsed legacy .json contents to {'entries': [...], 'stats': {...}}.
+    Files may already be in this shape; the oldest ones are a bare list and have
+    their stats built here in one pass. Raises KeyError/TypeError for contents
+    of any other shape.
+    """
+    if isinstance(data, dict):
+        entries, stats = data['entries'], data['stats']
+        if not isinstance(entries, list) or not isinstance(stats, dict):
+            raise TypeError("malformed data document")
+        missing = _empty_stats().keys() - stats.keys()
+        if missing:
+            raise KeyError(f"data document stats missing {sorted(missing)}")
+        return data
+    
+    if not isinstance(data, list):
+        raise TypeError("malformed data document")
+    
+    stats = _empty_stats()
+    for entry in data:
+        stats = _add_to_stats(stats, entry)
+    return {'entries': data, 'stats': stats}
+
+
+def _load_cached(filename):
+    """
+    Load and parse a legacy .json data file, reusing the previous parse while
+    the file's mtime is unchanged. Raises FileNotFoundError/JSONDecodeError
+    like orjson.loads, and KeyError/TypeError for a malformed document.
+    """
+    mtime_ns = os.stat(filename).st_mtime_ns
+
+    with _DATA_CACHE_LOCK:
+        cached = _DATA_CACHE.get(filename)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+
+        with open(filename, 'rb') as f:
+            document = _as_document(orjson.loads(f.read()))
+        _DATA_CACHE[filename] = (mtime_ns, document)
+        return document
+
+
+def _new_tail_state(ino=None):
+    """Empty parse state for a .jsonl file (ino is None until the file exists)."""
+    return {'generation': next(_TAIL_GENERATION), 'ino': ino, 'offset': 0,
+            'lines': [], 'ts': array('q'), 'stats': _empty_stats(), 'pending': []}
+
+
+def _timestamp_ms(entry):
+    """Epoch milliseconds of an entry's ISO 8601 timestamp."""
+    return int(datetime.fromisoformat(entry['timestamp']).timestamp() * 1000)
+
+
+def _append_line(state, line, entry):
+    """
+    Add an encoded entry line to a parse state. Raises KeyError/TypeError/
+    ValueError for a malformed entry, leaving the state untouched.
+    """
+    # Everything that can fail runs before the state is modified
+    ts_ms = _timestamp_ms(entry)
+    stats = _add_to_stats(state['stats'], entry)
+    
+    # 'ts' grows first so readers bounded by len(lines) never index past it
+    state['ts'].append(ts_ms)
+    state['lines'].append(line)
+    state['stats'] = stats
+
+
+def _drop_agg(filename):
+    """
+    Clear the _AGG snapshot if it was built from the parse state of filename,
+    so the next /api/stats republishes it. Caller must hold _TAIL_LOCK.
+    """
+    global _AGG
+    
+    if _AGG[0] == filename:
+        _AGG = (None, 0, 0, 0.0)
+
+
+def _migrate_legacy(filename):
+    """
+    Move the entries of the legacy .json file for the same day as filename
+    into filename, ahead of any lines it already holds, and remove the .json.
+    Older versions wrote the current day to .json, so without this the pings
+    saved before an upgrade would be hidden by the day's .jsonl. Malformed
+    legacy files are left in place. Caller must hold _TAIL_LOCK.
+    """
+    legacy = os.path.splitext(filename)[0] + '.json'
+    try:
+        entries = _load_cached(legacy)['entries']
+    except FileNotFoundError:
+        return
+    except (orjson.JSONDecodeError, KeyError, TypeError):
+        app.logger.warning(f"Not migrating malformed data file {legacy}")
+        return
+    
+    try:
+        with open(filename, 'rb') as f:
+            existing = f.read()
+    except FileNotFoundError:
+        existing = b''
+    
+    # Written aside and renamed so readers never see a half-migrated file
+    tmp = filename + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(b''.join(orjson.dumps(entry) + b'\n' for entry in entries) + existing)
+    os.replace(tmp, filename)
+    os.unlink(legacy)
+    with _DATA_CACHE_LOCK:
+        _DATA_CACHE.pop(legacy, None)
+    app.logger.info(f"Migrated {legacy} to {filename}")
+
+
+def _sync_tail(filename):
+    """
+    Bring the parse state of filename up to date with the file and return it,
+    or None if neither the file nor buffered lines exist. A new state first
+    takes in the day's legacy .json file, if any. Caller must hold _TAIL_LOCK.
+    """
+    state = _TAIL.get(filename)
+    if state is None:
+        _migrate_legacy(filename)
+    
+    try:
+        f = open(filename, 'rb')
+    except FileNotFoundError:
+        if state is not None and state['pending']:
+            return state
+        _TAIL.pop(filename, None)
+        _drop_agg(filename)
+        return None
+    
+    with f:
+        st = os.fstat(f.fileno())
+        carried = []
+        if (state is None or state['ino'] not in (None, st.st_ino)
+                or st.st_size < state['offset']):
+            # File was replaced or truncated: rebuild, keeping buffered lines
+            if state is not None:
+                carried = state['pending']
+            state = _new_tail_state(st.st_ino)
+            _TAIL[filename] = state
+            _drop_agg(filename)
+        
+        if st.st_size == state['offset'] and not carried:
+            return state
+        
+        f.seek(state['offset'])
+        chunk = f.read()
+    
+    state['ino'] = st.st_ino
+    
+    # Leave a partially written last line for the next call
+    end = chunk.rfind(b'\n') + 1
+    for line in chunk[:end].splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            _append_line(state, line, orjson.loads(line))
+        except (ValueError, KeyError, TypeError):
+            # Covers orjson.JSONDecodeError and entries missing fields
+            app.logger.warning(f"Skipping malformed line in {filename}")
+    state['offset'] += end
+    
+    for line in carried:
+        _append_line(state, line, orjson.loads(line))
+        state['pending'].append(line)
+    return state
+
+
+def _load_incremental(filename):
+    """
+    Return the parse state of a .jsonl data file, decoding only the complete
+    lines appended since the previous call. Each line is decoded once to update
+    the stats and then kept as raw bytes. State is rebuilt from scratch if the
+    file was replaced or truncated. Raises FileNotFoundError.
+    """
+    with _TAIL_LOCK:
+        state = _sync_tail(filename)
+    if state is None:
+        raise FileNotFoundError(filename)
+    return state
+
+
+def _publish_stats(filename):
+    """
+    Publish the stats of filename as the _AGG snapshot and return it, unless a
+    snapshot for that file was published in the meantime. Raises
+    FileNotFoundError.
+    """
+    global _AGG
+    
+    # Under the lock so a concurrent save can't be overwritten by older totals
+    with _TAIL_LOCK:
+        if _AGG[0] != filename:
+            state = _sync_tail(filename)
+            if state is None:
+                raise FileNotFoundError(filename)
+            stats = state['stats']
+            _AGG = (filename, stats['total'], stats['successful'], stats['sum_rt'])
+        return _AGG
+
+
+def _append_fd(filename):
+    """
+    Return (fd, fstat result) for an O_APPEND descriptor on filename, reusing
+    the cached one while it still refers to the file on disk. Caller must hold
+    _TAIL_LOCK.
+    """
+    global _APPEND_FD
+    
+    cached_name, fd = _APPEND_FD
+    if cached_name == filename:
+        st = os.fstat(fd)
+        try:
+            if os.stat(filename).st_ino == st.st_ino:
+                return fd, st
+        except FileNotFoundError:
+            pass
+    
+    if fd is not None:
+        os.close(fd)
+    _APPEND_FD = (None, None)
+    fd = os.open(filename, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+    _APPEND_FD = (filename, fd)
+    return fd, os.fstat(fd)
+
+
+def _flush():
+    """Write buffered lines to their data files, one append per file."""
+    global _LAST_FLUSH
+    
+    with _TAIL_LOCK:
+        for filename, state in list(_TAIL.items()):
+            if not state['pending']:
+                continue
+            
+            data = b''.join(line + b'\n' for line in state['pending'])
+            fd, st = _append_fd(filename)
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+            state['pending'] = []
+            
+            if state['ino'] in (None, st.st_ino) and st.st_size == state['offset']:
+                state['ino'] = st.st_ino
+                state['offset'] += len(data)
+            else:
+                # Someone else appended since our last read; re-read it all
+                del _TAIL[filename]
+                _drop_agg(filename)
+        
+        _LAST_FLUSH = time.monotonic()
+
+
+# Don't lose buffered pings on shutdown
+atexit.register(_flush)
 
 
 def cleanup_old_files():
     """Remove data files older than CLEANUP_DAYS."""
     try:
-        cutoff_date = datetime.now() - timedelta(days=CLEANUP_DAYS)
-        data_path = Path(DATA_DIR)
+        # Filenames sort by date, so compare against the cutoff's name prefix
+        # instead of parsing a date out of every file
+        cutoff_date = datetime.now(_TZ) - timedelta(days=CLEANUP_DAYS)
+        cutoff_name = f'ping_data_{cutoff_date:%Y-%m-%d}'
         
-        for file_path in data_path.glob('ping_data_*.json'):
-            try:
-                # Extract date from filename
-                date_str = file_path.stem.replace('ping_data_', '')
-                file_date = datetime.strptime(date_str, '%Y-%m-%d')
-                
-                if file_date < cutoff_date:
-                    file_path.unlink()
-                    app.logger.info(f"Cleaned up old file: {file_path}")
-            except ValueError:
-                # Skip files that don't match expected format
-                continue
+        with os.scandir(DATA_DIR) as entries:
+            for entry in entries:
+                if (entry.name.startswith('ping_data_')
+                        and entry.name.endswith(('.json', '.jsonl'))
+                        and entry.name < cutoff_name):
+                    os.unlink(entry.path)
+                    with _TAIL_LOCK:
+                        _TAIL.pop(entry.path, None)
+                        _drop_agg(entry.path)
+                    with _DATA_CACHE_LOCK:
+                        _DATA_CACHE.pop(entry.path, None)
+                    app.logger.info(f"Cleaned up old file: {entry.path}")
     except Exception as e:
         app.logger.error(f"Error during cleanup: {e}")
 
 
+def cleanup_worker():
+    """Run cleanup now and re-arm a timer to run it again every CLEANUP_INTERVAL."""
+    cleanup_old_files()
+    
+    timer = threading.Timer(CLEANUP_INTERVAL, cleanup_worker)
+    timer.daemon = True
+    timer.start()
+
+
+def _icmp_checksum(data):
+    """Internet checksum (RFC 1071) of an ICMP message."""
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+def _icmp_ping(sock, host, timeout):
+    """
+    Send a single ICMP echo request over an unprivileged ICMP datagram socket
+    and return the round-trip time in milliseconds, or None if no reply
+    arrives within timeout.
+    """
+    # The kernel rewrites the identifier to the socket's port, so replies are
+    # matched on the sequence number only
+    sequence = next(_ICMP_SEQUENCE) & 0xffff
+    payload = struct.pack('!d', time.time())
+    header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, 0, sequence)
+    checksum = _icmp_checksum(header + payload)
+    packet = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, checksum, 0, sequence) + payload
+    
+    sent = time.perf_counter()
+    sock.sendto(packet, (host, 0))
+    deadline = sent + timeout
+    
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            return None
+        ready, _, _ = select.select([sock], [], [], remaining)
+        if not ready:
+            return None
+        
+        reply = sock.recv(1024)
+        received = time.perf_counter()
+        if len(reply) < 8:
+            continue
+        reply_type, _, _, _, reply_sequence = struct.unpack('!BBHHH', reply[:8])
+        if reply_type == ICMP_ECHO_REPLY and reply_sequence == sequence:
+            return round((received - sent) * 1000, 2)
+
+
 def ping_host(host):
     """
     Ping a host and return the response time in milliseconds.
@@ -77,22 +478,35 @@ def ping_host(host):
         else:
             return None
     
+    global _ICMP_SOCKET_ALLOWED
+    
     try:
+        # Talk ICMP directly rather than spawning a ping process per probe
+        if _ICMP_SOCKET_ALLOWED:
+            try:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+            except OSError as e:
+                # EACCES outside net.ipv4.ping_group_range, EPROTONOSUPPORT or
+                # EAFNOSUPPORT on kernels/sandboxes without ICMP sockets
+                _ICMP_SOCKET_ALLOWED = False
+                app.logger.warning(f"Unprivileged ICMP sockets unavailable ({e}), "
+                                   "falling back to the ping command")
+            else:
+                with sock:
+                    return _icmp_ping(sock, host, PING_TIMEOUT)
+        
         # Use ping command with 1 packet and 5 second timeout
         result = subprocess.run(
-            ['ping', '-c', '1', '-W', '5', host],
+            ['ping', '-c', '1', '-W', str(PING_TIMEOUT), host],
             capture_output=True,
-            text=True,
             timeout=10
         )
         
         if result.returncode == 0:
             # Extract time from ping output
-            output = result.stdout
-            for line in output.split('\n'):
-                if 'time=' in line:
-                    time_part = line.split('time=')[1].split()[0]
-                    return float(time_part)
+            match = _TIME_RE.search(result.stdout)
+            if match:
+                return float(match.group(1))
         return None
     except Exception as e:
         app.logger.error(f"Ping error: {e}")
@@ -100,52 +514,131 @@ def ping_host(host):
 
 
 def save_ping_result(response_time, timestamp):
-    """Save ping result to today's data file."""
+    """
+    Save ping result to today's data file (one JSON object per line). Lines are
+    buffered and written in batches by _flush.
+    """
     filename = get_today_filename()
     
-    # Load existing data or create new
-    try:
-        with open(filename, 'r') as f:
-            data = json.load(f)
-    except (FileNotFoundError, json.JSONDecodeError):
-        data = []
-    
-    # Add new entry
     entry = {
         'timestamp': timestamp.isoformat(),
         'response_time': response_time,
         'success': response_time is not None
     }
-    data.append(entry)
     
-    # Save updated data
-    with open(filename, 'w') as f:
-        json.dump(data, f, indent=2)
+    global _AGG
+    
+    # Buffer the line; readers see it immediately through the parse state
+    with _TAIL_LOCK:
+        # This process is the only writer, so once the state exists it is
+        # current and the file doesn't need to be opened again
+        state = _TAIL.get(filename)
+        if state is None:
+            state = _sync_tail(filename)
+        if state is None:
+            state = _TAIL[filename] = _new_tail_state()
+        
+        line = orjson.dumps(entry)
+        _append_line(state, line, entry)
+        state['pending'].append(line)
+        
+        stats = state['stats']
+        _AGG = (filename, stats['total'], stats['successful'], stats['sum_rt'])
+        
+        flush_due = (len(state['pending']) >= FLUSH_MAX_PENDING
+                     or time.monotonic() - _LAST_FLUSH >= FLUSH_INTERVAL)
+    
+    if flush_due:
+        _flush()
 
 
 def ping_worker():
     """Background worker to ping every minute."""
     app.logger.info("Starting ping worker")
     
+    start = time.monotonic()
+    tick = 0
+    
     while True:
         try:
-            tz = pytz.timezone(TIMEZONE)
-            timestamp = datetime.now(tz)
+            timestamp = datetime.now(_TZ)
             response_time = ping_host(PING_TARGET)
             
             save_ping_result(response_time, timestamp)
             
             status = f"OK ({response_time}ms)" if response_time else "FAILED"
             app.logger.info(f"Ping {PING_TARGET}: {status}")
-            
-            # Cleanup old files once per day (at first ping of the day)
-            if timestamp.hour == 0 and timestamp.minute < 2:
-                cleanup_old_files()
                 
         except Exception as e:
             app.logger.error(f"Error in ping worker: {e}")
         
-        time.sleep(PING_INTERVAL)
+        # Sleep until the next fixed tick rather than a full interval, so time
+        # spent pinging and saving doesn't accumulate as drift. Ticks that were
+        # overrun entirely are skipped.
+        tick = max(tick + 1, int((time.monotonic() - start) // PING_INTERVAL) + 1)
+        time.sleep(max(0, start + tick * PING_INTERVAL - time.monotonic()))
+
+
+def start_background_workers():
+    """
+    Start the ping worker thread and the daily cleanup timer. Safe to call more
+    than once; only the first call in a process starts anything.
+    """
+    global _BACKGROUND_STARTED
+    
+    if _BACKGROUND_STARTED:
+        return
+    _BACKGROUND_STARTED = True
+    
+    # Start ping worker in background thread
+    ping_thread = threading.Thread(target=ping_worker, daemon=True)
+    ping_thread.start()
+    
+    # Cleanup old files on startup and then daily, off the ping thread
+    cleanup_worker()
+
+
+def _json_response(obj):
+    """Build a JSON response with orjson rather than Flask's json provider."""
+    return app.response_class(orjson.dumps(obj), mimetype='application/json')
+
+
+def _lines_response(lines):
+    """Build a JSON array response directly from already-encoded entry lines."""
+    return app.response_class(b'[' + b','.join(lines) + b']', mimetype='application/json')
+
+
+def _data_etag(filename):
+    """
+    ETag for a data file: appends always change its size and mtime, and
+    buffered pings change the line count of its parse state. The day and the
+    state's generation keep tags from repeating across days, restarts and
+    rebuilt states, where the other parts start over from zero.
+    """
+    try:
+        st = os.stat(filename)
+        mtime_ns, size = st.st_mtime_ns, st.st_size
+    except FileNotFoundError:
+        mtime_ns, size = 0, 0
+    
+    day = os.path.basename(filename).removeprefix('ping_data_').removesuffix('.jsonl')
+    state = _TAIL.get(filename)
+    generation, count = (state['generation'], len(state['lines'])) if state else (0, 0)
+    return f'{day}-{generation:x}-{mtime_ns:x}-{size:x}-{count:x}'
+
+
+def _with_etag(response, etag):
+    """Tag a response so clients revalidate it with If-None-Match."""
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _not_modified(etag):
+    """Return a bodiless 304 response if the client already has etag, else None."""
+    if request.if_none_match.contains(etag):
+        return _with_etag(app.response_class(status=304), etag)
+    return None
 
 
 @app.route('/')
@@ -159,31 +652,75 @@ def index():
 
 @app.route('/api/data')
 def get_data():
-    """API endpoint to get today's ping data."""
+    """
+    API endpoint to get today's ping data. With ?since=<epoch ms> only entries
+    newer than that are returned, so pollers just fetch what they're missing.
+    """
     filename = get_today_filename()
+    since = request.args.get('since', type=int)
     
     try:
-        with open(filename, 'r') as f:
-            data = json.load(f)
-        return jsonify(data)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return jsonify([])
+        etag = _data_etag(filename)
+        not_modified = _not_modified(etag)
+        if not_modified:
+            return not_modified
+        
+        state = _load_incremental(filename)
+        lines = state['lines']
+        if since is not None:
+            # Entries are appended in time order, so 'ts' is sorted
+            end = len(lines)
+            start = bisect.bisect_right(state['ts'], since, 0, end)
+            lines = lines[start:end]
+        return _with_etag(_lines_response(lines), etag)
+    except FileNotFoundError:
+        return _json_response([])
 
 
 @app.route('/api/data/<date>')
 def get_data_by_date(date):
     """API endpoint to get ping data for a specific date."""
     try:
-        # Construct the filename for the given date
+        # Construct the filename for the given date. Loading it migrates the
+        # .json files written by older versions; those that can't be migrated
+        # are read as is. Opening directly instead of checking os.path.exists
+        # first saves a stat per request.
+        try:
+            filename = os.path.join(DATA_DIR, f'ping_data_{date}.jsonl')
+            return _lines_response(_load_incremental(filename)['lines'])
+        except FileNotFoundError:
+            pass
+        
         filename = os.path.join(DATA_DIR, f'ping_data_{date}.json')
-
-        with open(filename, 'r') as f:
-            data = json.load(f)
-        return jsonify(data)
+        return _json_response(_load_cached(filename)['entries'])
     except FileNotFoundError:
-        return jsonify({'message': 'no file found on specified date'})
-    except json.JSONDecodeError:
-        return jsonify({'message': 'error reading data file'})
+        return _json_response({'message': 'no file found on specified date'})
+    except (orjson.JSONDecodeError, KeyError, TypeError):
+        return _json_response({'message': 'error reading data file'})
+
+
+def _stats_payload(total, successful, sum_rt):
+    """Build the /api/stats response body from running totals."""
+    if not total:
+        return {
+            'total_pings': 0,
+            'successful_pings': 0,
+            'failed_pings': 0,
+            'success_rate': 0,
+            'avg_response_time': 0
+        }
+    
+    avg_response_time = 0
+    if successful:
+        avg_response_time = sum_rt / successful
+    
+    return {
+        'total_pings': total,
+        'successful_pings': successful,
+        'failed_pings': total - successful,
+        'success_rate': (successful / total) * 100,
+        'avg_response_time': round(avg_response_time, 2)
+    }
 
 
 @app.route('/api/stats')
@@ -192,48 +729,48 @@ def get_stats():
     filename = get_today_filename()
     
     try:
-        with open(filename, 'r') as f:
-            data = json.load(f)
-        
-        if not data:
-            return jsonify({
-                'total_pings': 0,
-                'successful_pings': 0,
-                'failed_pings': 0,
-                'success_rate': 0,
-                'avg_response_time': 0
-            })
-        
-        successful = [entry for entry in data if entry['success']]
-        failed = [entry for entry in data if not entry['success']]
-        
-        avg_response_time = 0
-        if successful:
-            avg_response_time = sum(entry['response_time'] for entry in successful) / len(successful)
-        
-        stats = {
-            'total_pings': len(data),
-            'successful_pings': len(successful),
-            'failed_pings': len(failed),
-            'success_rate': (len(successful) / len(data)) * 100 if data else 0,
-            'avg_response_time': round(avg_response_time, 2)
-        }
+        etag = _data_etag(filename)
+        not_modified = _not_modified(etag)
+        if not_modified:
+            return not_modified
         
-        return jsonify(stats)
-    except (FileNotFoundError, json.JSONDecodeError):
-        return jsonify({
-            'total_pings': 0,
-            'successful_pings': 0,
-            'failed_pings': 0,
-            'success_rate': 0,
-            'avg_response_time': 0
-        })
+        # Lock-free snapshot of the writer's running totals; fall back to the
+        # parse state after a restart or date rollover
+        snapshot = _AGG
+        if snapshot[0] != filename:
+            snapshot = _publish_stats(filename)
+        _, total, successful, sum_rt = snapshot
+        
+        return _with_etag(_json_response(_stats_payload(total, successful, sum_rt)), etag)
+    except FileNotFoundError:
+        return _json_response(_stats_payload(0, 0, 0.0))
+
+
+@app.route('/api/stats/<date>')
+def get_stats_by_date(date):
+    """API endpoint to get basic statistics for a specific date."""
+    try:
+        # Same lookup as get_data_by_date; the totals come from the running
+        # aggregate kept while parsing, not a fresh pass over the entries
+        try:
+            filename = os.path.join(DATA_DIR, f'ping_data_{date}.jsonl')
+            stats = _load_incremental(filename)['stats']
+        except FileNotFoundError:
+            filename = os.path.join(DATA_DIR, f'ping_data_{date}.json')
+            stats = _load_cached(filename)['stats']
+        
+        return _json_response(_stats_payload(stats['total'], stats['successful'], stats['sum_rt']))
+    except FileNotFoundError:
+        return _json_response({'message': 'no file found on specified date'})
+    except (orjson.JSONDecodeError, KeyError, TypeError):
+        return _json_response({'message': 'error reading data file'})
 
 
 if __name__ == '__main__':
-    # Start ping worker in background thread
-    ping_thread = threading.Thread(target=ping_worker, daemon=True)
-    ping_thread.start()
+    # Exit normally on SIGTERM (e.g. docker stop) so atexit flushes the buffer
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    
+    start_background_workers()
     
-    # Start Flask app
+    # Start Flask development server (use gunicorn_conf.py in production)
     app.run(host='0.0.0.0', port=5002, debug=False)
\ No newline at end of file
@@ -0,0 +1,19 @@
+"""
+Gunicorn configuration for the network stability monitor.
+
+Run with: gunicorn -c gunicorn_conf.py app:app
+"""
+
+bind = '0.0.0.0:5002'
+
+# Exactly one worker so there is a single ping worker and write buffer per
+# container; gevent lets that worker serve many dashboard viewers at once
+workers = 1
+worker_class = 'gevent'
+worker_connections = 200
+
+
+def post_worker_init(worker):
+    """Start the ping worker and cleanup timer inside the serving process."""
+    from app import start_background_workers
+    start_background_workers()
@@ -3,26 +3,56 @@
 Basic tests for the network stability monitoring application.
 """
 
+import errno
+import itertools
 import json
 import os
+import shutil
+import struct
 import tempfile
 import unittest
-from unittest.mock import patch
-from datetime import datetime
+from unittest.mock import MagicMock, patch
+from datetime import datetime, timedelta
 import pytz
 
-# Set up environment for testing
+# Set up environment for testing; the data directory itself is created per
+# test class in setUpClass
 os.environ['MOCK_PING'] = 'true'
-os.environ['DATA_DIR'] = tempfile.mkdtemp()
+os.environ.setdefault('DATA_DIR', tempfile.gettempdir())
 
-from app import app, ping_host, save_ping_result, get_today_filename, cleanup_old_files
+import app as app_module
+from app import (app, ping_host, save_ping_result, get_today_filename, cleanup_old_files,
+                 _load_cached, _load_incremental, _icmp_checksum, _icmp_ping)
 
 
 class TestNetworkStabilityApp(unittest.TestCase):
     
+    @classmethod
+    def setUpClass(cls):
+        cls.tz = pytz.timezone('UTC')
+        cls.data_dir = tempfile.mkdtemp()
+        cls._original_data_dir = app_module.DATA_DIR
+        app_module.DATA_DIR = cls.data_dir
+        app_module._TODAY_FILENAME = (None, None)
+    
+    @classmethod
+    def tearDownClass(cls):
+        # Drop buffered pings so the atexit flush doesn't write into the
+        # removed directory
+        app_module._TAIL.clear()
+        app_module.DATA_DIR = cls._original_data_dir
+        app_module._TODAY_FILENAME = (None, None)
+        shutil.rmtree(cls.data_dir, ignore_errors=True)
+    
     def setUp(self):
         self.app = app.test_client()
         self.app.testing = True
+        
+        # Start every test from an empty day
+        if os.path.exists(get_today_filename()):
+            os.remove(get_today_filename())
+        app_module._TAIL.clear()
+        app_module._AGG = (None, 0, 0, 0.0)
     
     def test_ping_mock_mode(self):
         """Test ping function in mock mode."""
@@ -30,25 +60,321 @@ class TestNetworkStabilityApp(unittest.TestCase):
         # Should return a float (mock response time) or None (mock failure)
         self.assertTrue(result is None or isinstance(result, float))
     
+    @patch.dict(os.environ, {'MOCK_PING': 'false'})
+    @patch('app.subprocess.run')
+    def test_ping_falls_back_to_command(self, mock_run):
+        """Test that the ping command is used and parsed when ICMP sockets are unavailable."""
+        mock_run.return_value.returncode = 0
+        mock_run.return_value.stdout = (
+            b'PING 8.8.8.8 (8.8.8.8) 56(84) bytes of data.\n'
+            b'64 bytes from 8.8.8.8: icmp_seq=1 ttl=117 time=12.3 ms\n'
+        )
+        
+        for error in (PermissionError(errno.EACCES, 'Permission denied'),
+                      OSError(errno.EPROTONOSUPPORT, 'Protocol not supported')):
+            with patch('app._ICMP_SOCKET_ALLOWED', True), \
+                    patch('app.socket.socket', side_effect=error):
+                self.assertEqual(ping_host('8.8.8.8'), 12.3)
+                self.assertFalse(app_module._ICMP_SOCKET_ALLOWED)
+    
+    def test_icmp_checksum(self):
+        """Test the Internet checksum against the RFC 1071 example."""
+        self.assertEqual(_icmp_checksum(b'\x00\x01\xf2\x03\xf4\xf5\xf6\xf7'), 0x220d)
+        
+        # A message carrying its own checksum sums to zero
+        header = struct.pack('!BBHHH', 8, 0, 0, 0, 1)
+        checksum = _icmp_checksum(header + b'abc')
+        self.assertEqual(_icmp_checksum(struct.pack('!BBHHH', 8, 0, checksum, 0, 1) + b'abc'), 0)
+    
+    @patch('app._ICMP_SEQUENCE', itertools.count(7))
+    @patch('app.select.select')
+    def test_icmp_ping_matches_reply(self, mock_select):
+        """Test that short and unrelated replies are skipped until the echo reply."""
+        sock = MagicMock()
+        sock.recv.side_effect = [
+            b'\x00',
+            struct.pack('!BBHHH', 0, 0, 0, 0, 8),
+            struct.pack('!BBHHH', 0, 0, 0, 0, 7)
+        ]
+        mock_select.return_value = ([sock], [], [])
+        
+        result = _icmp_ping(sock, '8.8.8.8', 5)
+        self.assertIsInstance(result, float)
+        self.assertEqual(sock.recv.call_count, 3)
+        
+        packet, address = sock.sendto.call_args[0]
+        self.assertEqual(address, ('8.8.8.8', 0))
+        self.assertEqual(struct.unpack('!BBHHH', packet[:8])[::4], (8, 7))
+        self.assertEqual(_icmp_checksum(packet), 0)
+    
+    @patch('app.select.select', return_value=([], [], []))
+    def test_icmp_ping_timeout(self, mock_select):
+        """Test that no reply within the timeout is reported as a failure."""
+        sock = MagicMock()
+        self.assertIsNone(_icmp_ping(sock, '8.8.8.8', 5))
+        sock.recv.assert_not_called()
+    
     def test_save_and_load_ping_result(self):
         """Test saving and loading ping results."""
-        tz = pytz.timezone('UTC')
-        timestamp = datetime.now(tz)
+        timestamp = datetime.now(self.tz)
         response_time = 50.5
         
-        # Save a ping result
+        # Save a ping result; it is buffered until flushed
         save_ping_result(response_time, timestamp)
+        filename = get_today_filename()
+        self.assertFalse(os.path.exists(filename))
+        self.assertEqual(_load_incremental(filename)['stats']['total'], 1)
         
         # Check if file was created and contains data
-        filename = get_today_filename()
+        app_module._flush()
         self.assertTrue(os.path.exists(filename))
         
         with open(filename, 'r') as f:
-            data = json.load(f)
+            data = [json.loads(line) for line in f]
         
         self.assertEqual(len(data), 1)
         self.assertEqual(data[0]['response_time'], response_time)
         self.assertTrue(data[0]['success'])
+        
+        stats = _load_incremental(filename)['stats']
+        self.assertEqual(stats, {'total': 1, 'successful': 1, 'sum_rt': response_time})
+        
+        # The API serves the stored lines as a JSON array
+        response = self.app.get('/api/data')
+        self.assertEqual(json.loads(response.data), data)
+        
+        response = self.app.get('/api/stats')
+        self.assertEqual(json.loads(response.data)['avg_response_time'], response_time)
+    
+    def test_flush_after_max_pending(self):
+        """Test that buffered pings are written once enough accumulate."""
+        for _ in range(app_module.FLUSH_MAX_PENDING):
+            save_ping_result(25.0, datetime.now(self.tz))
+        
+        with open(get_today_filename(), 'r') as f:
+            self.assertEqual(len(f.readlines()), app_module.FLUSH_MAX_PENDING)
+        
+        # Flushed lines are not parsed a second time
+        state = _load_incremental(get_today_filename())
+        self.assertEqual(len(state['lines']), app_module.FLUSH_MAX_PENDING)
+        self.assertEqual(state['pending'], [])
+    
+    def test_save_does_not_reopen_data_file(self):
+        """Test that saves after the first don't open the day file."""
+        save_ping_result(25.0, datetime.now(self.tz))
+        app_module._flush()
+        
+        with patch('app.open', create=True, side_effect=open) as mock_open:
+            for _ in range(app_module.FLUSH_MAX_PENDING - 1):
+                save_ping_result(25.0, datetime.now(self.tz))
+        self.assertEqual(mock_open.call_count, 0)
+        self.assertEqual(_load_incremental(get_today_filename())['stats']['total'],
+                         app_module.FLUSH_MAX_PENDING)
+    
+    def test_flush_reopens_deleted_data_file(self):
+        """Test that the cached append fd is reused, and replaced once the file is deleted."""
+        filename = get_today_filename()
+        save_ping_result(10.0, datetime.now(self.tz))
+        app_module._flush()
+        
+        with patch('app.os.open', side_effect=os.open) as mock_open:
+            save_ping_result(20.0, datetime.now(self.tz))
+            app_module._flush()
+            self.assertEqual(mock_open.call_count, 0)
+            
+            os.remove(filename)
+            save_ping_result(30.0, datetime.now(self.tz))
+            app_module._flush()
+            self.assertEqual(mock_open.call_count, 1)
+        
+        with open(filename, 'r') as f:
+            data = [json.loads(line) for line in f]
+        self.assertEqual([entry['response_time'] for entry in data], [30.0])
+        self.assertEqual(_load_incremental(filename)['stats']['total'], 1)
+        
+        # The stats snapshot is rebuilt from the new file rather than kept
+        response = self.app.get('/api/stats')
+        self.assertEqual(json.loads(response.data)['total_pings'], 1)
+        self.assertEqual(len(json.loads(self.app.get('/api/data').data)), 1)
+    
+    def test_data_since(self):
+        """Test that ?since= only returns entries newer than the given time."""
+        start = datetime(2025, 9, 14, 4, 48, tzinfo=self.tz)
+        for minute in range(3):
+            save_ping_result(30.0 + minute, start + timedelta(minutes=minute))
+        
+        since = int((start + timedelta(minutes=1)).timestamp() * 1000)
+        response = self.app.get(f'/api/data?since={since}')
+        data = json.loads(response.data)
+        self.assertEqual([entry['response_time'] for entry in data], [32.0])
+        
+        response = self.app.get('/api/data')
+        self.assertEqual(len(json.loads(response.data)), 3)
+    
+    def test_conditional_get(self):
+        """Test that unchanged data is answered with 304 Not Modified."""
+        save_ping_result(None, datetime.now(self.tz))
+        
+        for url in ('/api/data', '/api/stats'):
+            response = self.app.get(url)
+            etag = response.headers['ETag']
+            
+            response = self.app.get(url, headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.data, b'')
+    
+    def test_etag_changes_across_days_and_restarts(self):
+        """Test that ETags don't repeat when the day or the process starts over."""
+        etags = []
+        for day in ('2025-09-13', '2025-09-14'):
+            filename = os.path.join(self.data_dir, f'ping_data_{day}.jsonl')
+            with patch('app.get_today_filename', return_value=filename):
+                save_ping_result(20.0, datetime.now(self.tz))
+                etags.append(self.app.get('/api/data').headers['ETag'])
+        
+        # A restart loses the buffer and starts counting again
+        save_ping_result(20.0, datetime.now(self.tz))
+        etags.append(self.app.get('/api/stats').headers['ETag'])
+        app_module._TAIL.clear()
+        app_module._AGG = (None, 0, 0, 0.0)
+        save_ping_result(30.0, datetime.now(self.tz))
+        etags.append(self.app.get('/api/stats').headers['ETag'])
+        
+        self.assertEqual(len(set(etags)), len(etags))
+    
+    def test_load_cached_invalidates_on_mtime(self):
+        """Test that cached data is reused until the file changes."""
+        filename = os.path.join(self.data_dir, 'cache_test.json')
+        with open(filename, 'w') as f:
+            json.dump([{'response_time': 20.0, 'success': True}], f)
+        
+        first = _load_cached(filename)
+        self.assertIs(_load_cached(filename), first)
+        
+        # Rewrite with a different mtime to force a re-parse
+        with open(filename, 'w') as f:
+            json.dump([], f)
+        st = os.stat(filename)
+        os.utime(filename, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+        self.assertEqual(_load_cached(filename)['entries'], [])
+    
+    def test_load_incremental_parses_appended_lines(self):
+        """Test that only complete, newly appended lines are decoded."""
+        filename = os.path.join(self.data_dir, 'tail_test.jsonl')
+        timestamp = datetime.now(self.tz).isoformat()
+        with open(filename, 'w') as f:
+            f.write(json.dumps({'timestamp': timestamp, 'response_time': 20.0,
+                                'success': True}) + '\n')
+        
+        state = _load_incremental(filename)
+        self.assertEqual(len(state['lines']), 1)
+        
+        # A partially written line is left for the next call
+        line = json.dumps({'timestamp': timestamp, 'response_time': None,
+                           'success': False}) + '\n'
+        with open(filename, 'a') as f:
+            f.write(line[:10])
+        self.assertEqual(len(_load_incremental(filename)['lines']), 1)
+        
+        with open(filename, 'a') as f:
+            f.write(line[10:])
+        state = _load_incremental(filename)
+        self.assertEqual(len(state['lines']), 2)
+        self.assertEqual(state['stats'], {'total': 2, 'successful': 1, 'sum_rt': 20.0})
+    
+    def test_load_incremental_skips_malformed_entries(self):
+        """Test that an entry missing fields is kept out of both lines and stats."""
+        filename = os.path.join(self.data_dir, 'malformed_test.jsonl')
+        timestamp = datetime.now(self.tz).isoformat()
+        with open(filename, 'w') as f:
+            f.write(json.dumps({'timestamp': timestamp, 'response_time': 20.0}) + '\n')
+            f.write(json.dumps({'timestamp': timestamp, 'response_time': None,
+                                'success': True}) + '\n')
+            f.write(json.dumps({'timestamp': timestamp, 'response_time': 30.0,
+                                'success': True}) + '\n')
+        
+        state = _load_incremental(filename)
+        self.assertEqual(len(state['lines']), 1)
+        self.assertEqual(len(state['ts']), 1)
+        self.assertEqual(state['stats'], {'total': 1, 'successful': 1, 'sum_rt': 30.0})
+    
+    def test_legacy_list_file_stats(self):
+        """Test that list-shaped .json files from older versions get stats rebuilt."""
+        filename = os.path.join(self.data_dir, 'legacy_test.json')
+        with open(filename, 'w') as f:
+            json.dump([
+                {'response_time': 20.0, 'success': True},
+                {'response_time': None, 'success': False},
+                {'response_time': 40.0, 'success': True}
+            ], f)
+        
+        stats = _load_cached(filename)['stats']
+        self.assertEqual(stats, {'total': 3, 'successful': 2, 'sum_rt': 60.0})
+    
+    def test_data_by_date(self):
+        """Test the date endpoints for JSONL, legacy .json and missing files."""
+        data_dir = self.data_dir
+        entry = {'timestamp': '2025-09-14T04:48:19+00:00', 'response_time': 41.56, 'success': True}
+        with open(os.path.join(data_dir, 'ping_data_2025-09-14.jsonl'), 'w') as f:
+            f.write(json.dumps(entry) + '\n')
+        with open(os.path.join(data_dir, 'ping_data_2025-09-13.json'), 'w') as f:
+            json.dump([entry], f)
+        
+        for date in ('2025-09-14', '2025-09-13'):
+            response = self.app.get(f'/api/data/{date}')
+            self.assertEqual(json.loads(response.data), [entry])
+            
+            response = self.app.get(f'/api/stats/{date}')
+            stats = json.loads(response.data)
+            self.assertEqual(stats['total_pings'], 1)
+            self.assertEqual(stats['avg_response_time'], 41.56)
+        
+        response = self.app.get('/api/data/2025-09-12')
+        self.assertIn('message', json.loads(response.data))
+    
+    def test_legacy_file_of_today_is_migrated(self):
+        """Test that pings an older version wrote to today's .json stay visible."""
+        filename = get_today_filename()
+        legacy = os.path.splitext(filename)[0] + '.json'
+        start = datetime.now(self.tz).replace(hour=0, minute=0, second=0, microsecond=0)
+        with open(legacy, 'w') as f:
+            json.dump([{'timestamp': (start + timedelta(minutes=minute)).isoformat(),
+                        'response_time': 10.0 + minute, 'success': True}
+                       for minute in range(2)], f)
+        with open(filename, 'w') as f:
+            f.write(json.dumps({'timestamp': (start + timedelta(minutes=2)).isoformat(),
+                                'response_time': None, 'success': False}) + '\n')
+        
+        save_ping_result(13.0, start + timedelta(minutes=3))
+        self.assertFalse(os.path.exists(legacy))
+        
+        date = os.path.basename(filename)[len('ping_data_'):-len('.jsonl')]
+        for url in ('/api/data', f'/api/data/{date}'):
+            data = json.loads(self.app.get(url).data)
+            self.assertEqual([entry['response_time'] for entry in data], [10.0, 11.0, None, 13.0])
+        
+        for url in ('/api/stats', f'/api/stats/{date}'):
+            stats = json.loads(self.app.get(url).data)
+            self.assertEqual(stats['total_pings'], 4)
+            self.assertEqual(stats['successful_pings'], 3)
+    
+    def test_data_by_date_malformed_legacy_file(self):
+        """Test that malformed legacy .json files give an error message, not a 500."""
+        contents = {
+            '2025-09-11': {'readings': []},
+            '2025-09-10': [{'timestamp': '2025-09-10T00:00:00+00:00',
+                            'response_time': None, 'success': True}],
+            '2025-09-09': {'entries': [], 'stats': {'total': 0}},
+            '2025-09-08': 42
+        }
+        for date, document in contents.items():
+            with open(os.path.join(self.data_dir, f'ping_data_{date}.json'), 'w') as f:
+                json.dump(document, f)
+            
+            for url in (f'/api/data/{date}', f'/api/stats/{date}'):
+                response = self.app.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(json.loads(response.data), {'message': 'error reading data file'})
     
     def test_web_routes(self):
         """Test web application routes."""
@@ -68,12 +394,30 @@ class TestNetworkStabilityApp(unittest.TestCase):
         data = json.loads(response.data)
         self.assertIsInstance(data, list)
     
+    def test_cleanup_old_files(self):
+        """Test that only data files older than the retention period are removed."""
+        data_dir = self.data_dir
+        yesterday = datetime.now(self.tz) - timedelta(days=1)
+        old_file = os.path.join(data_dir, 'ping_data_2000-01-01.jsonl')
+        legacy_file = os.path.join(data_dir, 'ping_data_2000-01-02.json')
+        recent_file = os.path.join(data_dir, f'ping_data_{yesterday:%Y-%m-%d}.jsonl')
+        other_file = os.path.join(data_dir, 'ping_data_2000-01-01.jsonl.bak')
+        for filename in (old_file, legacy_file, recent_file, other_file):
+            open(filename, 'w').close()
+        
+        cleanup_old_files()
+        
+        self.assertFalse(os.path.exists(old_file))
+        self.assertFalse(os.path.exists(legacy_file))
+        self.assertTrue(os.path.exists(recent_file))
+        self.assertTrue(os.path.exists(other_file))
+    
     def test_today_filename_generation(self):
         """Test that filename generation includes date."""
         filename = get_today_filename()
         today = datetime.now().strftime('%Y-%m-%d')
         self.assertIn(today, filename)
-        self.assertTrue(filename.endswith('.json'))
+        self.assertTrue(filename.endswith('.jsonl'))
 
 
 if __name__ == '__main__':